@@ -0,0 +1,423 @@
+"""Shared implementation of the add_*_version.py scripts.
+
+Each script duplicates the latest version entry of its package and
+updates only the version number and download URL. The per-package
+scripts are thin wrappers around :func:`run`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import errno
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+# SemVer 2.0.0 (without build metadata). Prerelease identifiers are fully
+# validated here, including the no-leading-zero rule for numeric ones.
+SEMVER_PATTERN = re.compile(
+    r"(?P<major>0|[1-9]\d*)\.(?P<minor>0|[1-9]\d*)\.(?P<patch>0|[1-9]\d*)"
+    r"(?:-(?P<prerelease>"
+    r"(?:0|[1-9]\d*|\d*[a-zA-Z-][0-9a-zA-Z-]*)"
+    r"(?:\.(?:0|[1-9]\d*|\d*[a-zA-Z-][0-9a-zA-Z-]*))*"
+    r"))?",
+    re.ASCII,
+)
+JOURNAL_DIR_NAME = ".resilient_write"
+
+# Parsed input files keyed by (resolved path, st_mtime_ns); only used when a
+# caller opts in with cache=True.
+_JSON_CACHE: Dict[Tuple[str, int], Tuple[Dict, str]] = {}
+
+
+PrereleaseToken = Tuple[int, Union[int, str]]
+VersionSortKey = Tuple[Tuple[int, ...], Tuple[int, Tuple[PrereleaseToken, ...]]]
+
+
+class StalePrecondition(RuntimeError):
+    """Raised when the target file changed between reading and writing it."""
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_prerelease_identifier(identifier: str) -> PrereleaseToken:
+    # SEMVER_PATTERN has already validated the identifier's shape.
+    if identifier.isdigit():
+        return (0, int(identifier))
+    return (1, identifier)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_version(version: str) -> VersionSortKey:
+    if "-" not in version:
+        # Stable releases are plain numeric triples; split instead of running
+        # the regex, and fall through to it for anything unusual.
+        parts = version.split(".")
+        if len(parts) == 3 and all(
+            part.isascii() and part.isdigit() and (part == "0" or part[0] != "0")
+            for part in parts
+        ):
+            return (tuple(int(part) for part in parts), (1, tuple()))
+
+    match = SEMVER_PATTERN.fullmatch(version)
+    if not match:
+        raise ValueError(
+            f"Version '{version}' is invalid. "
+            "Use MAJOR.MINOR.PATCH, optionally with a prerelease suffix "
+            "(example: 1.2.3-beta or 1.2.3-beta.1)."
+        )
+
+    core = (
+        int(match.group("major")),
+        int(match.group("minor")),
+        int(match.group("patch")),
+    )
+    prerelease = match.group("prerelease")
+    if prerelease is None:
+        # Stable releases should sort after prerelease entries with the same core.
+        return (core, (1, tuple()))
+
+    parsed_prerelease = tuple(
+        _parse_prerelease_identifier(identifier)
+        for identifier in prerelease.split(".")
+    )
+    return (core, (0, parsed_prerelease))
+
+
+def _copy_for_update(data: Dict) -> Dict:
+    # add_version only mutates the per-package "versions" maps, so copying
+    # down to that level keeps the cached tree intact.
+    copied = dict(data)
+    packages = data.get("packages")
+    if isinstance(packages, dict):
+        copied["packages"] = {
+            package_id: (
+                {**package, "versions": dict(package["versions"])}
+                if isinstance(package, dict)
+                and isinstance(package.get("versions"), dict)
+                else package
+            )
+            for package_id, package in packages.items()
+        }
+    return copied
+
+
+def load_json(
+    path: Path, default_path: Optional[Path] = None, cache: bool = False
+) -> Tuple[Dict, str]:
+    if not path.exists():
+        hints = []
+        candidates = ", ".join(
+            sorted(str(candidate) for candidate in Path.cwd().glob("*.json"))
+        )
+        if candidates:
+            hints.append(f"Available JSON files in current directory: {candidates}.")
+        if default_path is not None and default_path.exists():
+            hints.append(f"For this tool, default --path is '{default_path}'.")
+        hint = f" {' '.join(hints)}" if hints else ""
+        raise FileNotFoundError(f"Input file not found: {path}.{hint}")
+    if cache:
+        key = (str(path.resolve()), path.stat().st_mtime_ns)
+        cached = _JSON_CACHE.get(key)
+        if cached is None:
+            cached = _JSON_CACHE[key] = load_json(path, default_path)
+        data, sha256 = cached
+        return _copy_for_update(data), sha256
+
+    raw = path.read_bytes()
+    sha256 = hashlib.sha256(raw).hexdigest()
+    if orjson is not None:
+        return orjson.loads(raw), sha256
+    return json.loads(raw), sha256
+
+
+def _invalidate_cache(path: Path) -> None:
+    resolved = str(path)
+    for key in [key for key in _JSON_CACHE if key[0] == resolved]:
+        del _JSON_CACHE[key]
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fsync_directory(path: Path) -> None:
+    # Persist the rename itself; directories cannot be opened this way on Windows.
+    if os.name == "nt":
+        return
+    dir_fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _replace_file(source: Path, target: Path) -> None:
+    try:
+        os.replace(source, target)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        # Cross-device rename: fall back to a non-atomic copy rather than fail.
+        shutil.copy2(source, target)
+        with target.open("rb+") as handle:
+            os.fsync(handle.fileno())
+        source.unlink()
+
+
+def _append_journal(path: Path, sha256: str, byte_count: int) -> None:
+    journal_dir = path.parent / JOURNAL_DIR_NAME
+    journal_dir.mkdir(exist_ok=True)
+    row = {
+        "ts": time.time_ns(),
+        "path": str(path),
+        "sha256": sha256,
+        "bytes": byte_count,
+        "mode": "overwrite",
+        "caller": Path(sys.argv[0]).name,
+    }
+    # A single short append is atomic on POSIX, so no locking is needed.
+    with (journal_dir / "journal.jsonl").open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(row) + "\n")
+
+
+def write_json(
+    path: Path,
+    payload: Dict,
+    journal: bool = False,
+    expected_prev_sha256: Optional[str] = None,
+) -> None:
+    # orjson only supports 2-space indentation, so output stays on the stdlib
+    # encoder to keep the existing 4-space layout.
+    text = json.dumps(payload, ensure_ascii=False, indent=4) + "\n"
+    content = text.encode("utf-8")
+    expected = hashlib.sha256(content).hexdigest()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Resolve symlinks so the temp file lands next to the real target.
+    path = path.resolve()
+    # A pid + random suffix is unique enough for a one-shot CLI and avoids the
+    # tempfile module's name-probing loop; "x" still refuses to clobber.
+    temp_path = path.with_name(
+        f".{path.name}.tmp.{os.getpid()}.{os.urandom(4).hex()}"
+    )
+    temp_handle = temp_path.open("xb")
+    try:
+        with temp_handle:
+            temp_handle.write(content)
+            temp_handle.flush()
+            os.fsync(temp_handle.fileno())
+        # Read the temp file back so a corrupted write never replaces the target.
+        if _sha256_file(temp_path) != expected:
+            raise RuntimeError(
+                f"write_corruption: {temp_path} does not match the payload."
+            )
+        if (
+            expected_prev_sha256 is not None
+            and _sha256_file(path) != expected_prev_sha256
+        ):
+            raise StalePrecondition(
+                f"stale_precondition: {path} changed since it was read. "
+                "Re-run the command, or pass --force to overwrite it."
+            )
+        _replace_file(temp_path, path)
+        _invalidate_cache(path)
+        _fsync_directory(path.parent)
+        if journal:
+            _append_journal(path, expected, len(content))
+    finally:
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _find_latest(versions: Dict) -> Tuple[int, str]:
+    # Single pass; the position decides how a new entry is inserted.
+    return max(enumerate(versions), key=lambda item: parse_version(item[1]))
+
+
+def _derive_entry(latest_version: str, latest_entry: Dict, new_version: str) -> Dict:
+    if latest_entry.get("version") != latest_version:
+        raise ValueError(
+            f"Latest entry version '{latest_entry.get('version')}' "
+            f"does not match key '{latest_version}'."
+        )
+    # Only top-level fields are overwritten below, so nested values can be
+    # shared with the latest entry instead of being cloned.
+    new_entry = dict(latest_entry)
+
+    new_entry["version"] = new_version
+    url = new_entry.get("url")
+    if isinstance(url, str):
+        # Release URLs contain the version twice (tag and file name), so every
+        # occurrence is replaced; an unchanged result means there was no match.
+        new_url = url.replace(latest_version, new_version)
+        if new_url == url:
+            raise ValueError(
+                f"Latest version '{latest_version}' not found in URL '{url}'."
+            )
+        new_entry["url"] = new_url
+    return new_entry
+
+
+def _is_already_added(versions: Dict, new_version: str) -> bool:
+    # True when the existing entry already has the URL this script would
+    # derive for it from the latest other version, so a re-run is harmless.
+    others = {key: value for key, value in versions.items() if key != new_version}
+    if not others:
+        return False
+    _, base_version = _find_latest(others)
+    try:
+        expected = _derive_entry(base_version, others[base_version], new_version)
+    except ValueError:
+        return False
+    return versions[new_version].get("url") == expected.get("url")
+
+
+def add_version(
+    package_id: str,
+    input_path: Path,
+    output_path: Path,
+    new_version: str,
+    journal: bool = False,
+    force: bool = False,
+    default_path: Optional[Path] = None,
+    cache: bool = False,
+    idempotent: bool = False,
+) -> Optional[str]:
+    # Validate early so the user gets a clear error before file mutation.
+    parse_version(new_version)
+
+    data, input_sha256 = load_json(input_path, default_path, cache=cache)
+    versions = data["packages"][package_id]["versions"]
+
+    if new_version in versions:
+        if idempotent and _is_already_added(versions, new_version):
+            # Nothing is written, so the file and its mtime stay untouched.
+            return None
+        raise ValueError(f"Version {new_version} already exists in {input_path}.")
+
+    latest_index, latest_version = _find_latest(versions)
+    new_entry = _derive_entry(latest_version, versions[latest_version], new_version)
+
+    if latest_index == len(versions) - 1:
+        # Common case: the latest entry is already last, so appending keeps
+        # the new entry right after it.
+        versions[new_version] = new_entry
+    else:
+        new_versions = {}
+        for key, value in versions.items():
+            new_versions[key] = value
+            if key == latest_version:
+                new_versions[new_version] = new_entry
+        data["packages"][package_id]["versions"] = new_versions
+
+    # Reject the write if another process updated the file in place meanwhile.
+    expected_prev_sha256 = None
+    if not force and output_path.resolve() == input_path.resolve():
+        expected_prev_sha256 = input_sha256
+    write_json(
+        output_path,
+        data,
+        journal=journal,
+        expected_prev_sha256=expected_prev_sha256,
+    )
+    return latest_version
+
+
+def run(
+    package_id: str,
+    tool_name: str,
+    default_path: Path,
+    argv: Optional[List[str]] = None,
+    example_version: str = "1.0.0",
+) -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            f"Add a new {package_id} ({tool_name}) version entry by copying the "
+            "latest one."
+        )
+    )
+    parser.add_argument(
+        "version", help=f"New version string, e.g. {example_version}"
+    )
+    parser.add_argument(
+        "--path",
+        default=default_path,
+        type=Path,
+        help=f"Path to the input vpm JSON file for {tool_name}.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Path to write the updated vpm JSON file (defaults to input path).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Overwrite the file even if it changed while this script was running.",
+    )
+    parser.add_argument(
+        "--idempotent",
+        action="store_true",
+        help=(
+            "Exit successfully without writing if the version was already added "
+            "with the same URL."
+        ),
+    )
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        help=(
+            f"Append a record of the write to {JOURNAL_DIR_NAME}/journal.jsonl "
+            "next to the output file."
+        ),
+    )
+    args = parser.parse_args(argv)
+
+    output_path = args.output or args.path
+
+    try:
+        latest_version = add_version(
+            package_id,
+            args.path,
+            output_path,
+            args.version,
+            journal=args.journal,
+            force=args.force,
+            default_path=default_path,
+            idempotent=args.idempotent,
+        )
+    except (
+        FileNotFoundError,
+        ValueError,
+        KeyError,
+        json.JSONDecodeError,
+        RuntimeError,
+    ) as error:
+        parser.exit(1, f"Error: {error}\n")
+
+    if latest_version is None:
+        print(f"Version {args.version} is already present in {args.path} (noop).")
+        return 0
+    print(
+        f"Added version {args.version} based on {latest_version} to {output_path}."
+    )
+    return 0
+